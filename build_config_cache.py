@@ -0,0 +1,31 @@
+"""Pre-build the JSON sidecar that load_config() reads instead of re-parsing the YAML.
+
+load_config() writes the sidecar itself on first parse; run this at deploy time
+when the app directory is read-only at runtime.
+
+Usage:
+    python build_config_cache.py [path/to/service_lines.yaml]
+"""
+import os
+import sys
+
+from serviceline_core import json_cache_path, read_yaml_config, write_json_cache
+
+
+def build(path: str) -> str:
+    try:
+        data, s = read_yaml_config(path)
+    except ImportError:
+        raise SystemExit(f"{path}: PyYAML is required to read it")
+    if not isinstance(data, dict) or not data.get("service_lines"):
+        raise SystemExit(f"{path}: no service_lines found")
+    cache = json_cache_path(path)
+    # Judge by this write, not by whether an old sidecar happens to be lying around
+    if not write_json_cache(path, s, data):
+        raise SystemExit(f"{path}: could not write {cache} (read-only, or the config doesn't round-trip through JSON)")
+    return cache
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else os.path.join("config", "service_lines.yaml")
+    print(f"Wrote {build(src)}")
@@ -0,0 +1,257 @@
+"""Config loading and scenario math behind the All-Service Line ROI calculator.
+
+Kept out of the Streamlit script so the cached helpers are defined once per
+process instead of being re-executed on every rerun.
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Any, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import streamlit as st
+
+CONFIG_PATHS = (os.path.join("config", "service_lines.yaml"), "service_lines.yaml", "serviceline.yaml")
+
+# (path, mtime_ns, size) for each config file present
+ConfigSignature = Tuple[Tuple[str, int, int], ...]
+
+
+def config_signature() -> ConfigSignature:
+    # One stat per candidate; the result changes whenever a config is edited, added or removed
+    sig = []
+    for p in CONFIG_PATHS:
+        try:
+            s = os.stat(p)
+        except OSError:
+            continue
+        sig.append((p, s.st_mtime_ns, s.st_size))
+    return tuple(sig)
+
+
+# Fallback when no config file is found (or PyYAML is missing); shared, never mutated
+SAMPLE_CONFIG: Dict[str, Any] = {
+    "service_lines": [{
+        "key": "hospitalist_med_surg",
+        "display_name": "Daytime Hospitalist (Med-Surg only)",
+        "capacity_label": "Beds",
+        "default": {"total_units": 18, "occupancy_pct": 75, "unit_rev": 2750, "unit_cost": 1850, "referrals_per_unit": 1.2},
+        "referrals": {"revenue_per_referral": 900, "types": [
+            {"name": "Cardiology", "pct": 30, "unit_rev": 500},
+            {"name": "GI", "pct": 25, "unit_rev": 1200},
+            {"name": "Surgery", "pct": 25, "unit_rev": 3000},
+            {"name": "Imaging/Diagnostics", "pct": 20, "unit_rev": 800},
+        ]},
+        "locum": {"enabled": True, "default_count": 1, "utilization_pct": 80, "hourly_rate": 265, "hours_per_shift": 10, "travel_per_day": 390},
+    }]}
+
+
+def json_cache_path(path: str) -> str:
+    return path + ".json"
+
+
+def read_json_cache(path: str, mtime_ns: int, size: int) -> Optional[Any]:
+    # The sidecar's config, or None when it is missing or wasn't built from this exact (mtime_ns, size) of the YAML.
+    # A plain "newer than the YAML" check misses edits copied in with their old mtime preserved (cp -p, rsync -a, tar).
+    try:
+        with open(json_cache_path(path), "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("source") != [mtime_ns, size]:
+        return None
+    return cached.get("config")
+
+
+def read_yaml_config(path: str) -> Tuple[Any, os.stat_result]:
+    # Parse a YAML config (None for an empty file) along with the stat of the file as opened.
+    # Raises ImportError when PyYAML isn't installed; it is only imported once a YAML config needs parsing.
+    import yaml
+    # libyaml's C loader when PyYAML was built with it, else the pure-Python SafeLoader
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(path, "r", encoding="utf-8") as f:
+        # Stamp from the open file, so an edit racing the parse just leaves the sidecar stale
+        s = os.fstat(f.fileno())
+        data = yaml.load(f, Loader=loader)
+    return data, s
+
+
+def write_json_cache(path: str, stat: os.stat_result, data: Any) -> bool:
+    # Atomically write <path>.json stamped with the YAML's (mtime_ns, size); False when it wasn't written
+    try:
+        text = json.dumps({"source": [stat.st_mtime_ns, stat.st_size], "config": data})
+    except (TypeError, ValueError):
+        return False
+    # json.dumps silently turns int/bool/null mapping keys into strings; only cache configs that round-trip exactly
+    if json.loads(text)["config"] != data:
+        return False
+    cache = json_cache_path(path)
+    tmp = f"{cache}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, cache)
+    except OSError:
+        # Read-only deploys just keep parsing the YAML
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+    return True
+
+
+# The config is read-only once loaded, so share one instance instead of copying it on every access.
+# Keyed on the signature, so unchanged files are never re-parsed; a few old versions are kept at most.
+@st.cache_resource(max_entries=8)
+def load_config(signature: ConfigSignature) -> Dict[str, Any]:
+    # The signature only lists files that existed when it was taken, so no second stat here
+    for p, mtime_ns, size in signature:
+        # Prefer the JSON sidecar written on a previous parse of this exact file version
+        data = read_json_cache(p, mtime_ns, size)
+        if data is None:
+            try:
+                data, s = read_yaml_config(p)
+            except FileNotFoundError:
+                # Removed since the signature was taken; fall through to the next candidate
+                continue
+            except ImportError:
+                # No PyYAML: only a fresh sidecar can be used
+                continue
+            write_json_cache(p, s, data)
+        if isinstance(data, dict) and data.get("service_lines"):
+            return data
+    return SAMPLE_CONFIG
+
+
+@dataclass(frozen=True, slots=True)
+class LocumDefaults:
+    """Locum Staffing widget defaults for one service line."""
+    enabled: bool
+    count: int
+    utilization_pct: int
+    hourly_rate: float
+    hours_per_shift: int
+    travel_per_day: float
+
+    @classmethod
+    def from_config(cls, locum: Dict[str, Any]) -> "LocumDefaults":
+        return cls(
+            enabled=bool(locum.get("enabled", False)),
+            count=int(locum.get("default_count", 1)),
+            utilization_pct=int(locum.get("utilization_pct", 0)),
+            hourly_rate=float(locum.get("hourly_rate", 0.0)),
+            hours_per_shift=int(locum.get("hours_per_shift", 10)),
+            travel_per_day=float(locum.get("travel_per_day", 0.0)),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class ServiceDefaults:
+    """Widget defaults for one service line, coerced once at load."""
+    capacity_label: str
+    capacity_singular: str
+    total_units: int
+    occupancy_pct: int
+    unit_rev: float
+    unit_cost: float
+    referrals_per_unit: float
+    revenue_per_referral: float
+    referral_pcts: Tuple[int, ...]
+    locum: LocumDefaults
+
+    @classmethod
+    def from_config(cls, sl: Dict[str, Any]) -> "ServiceDefaults":
+        default = sl.get("default", {})
+        referrals = sl.get("referrals", {})
+        cap_label = sl.get("capacity_label", "Units")
+        return cls(
+            capacity_label=cap_label,
+            capacity_singular=cap_label[:-1] if cap_label.endswith("s") else cap_label,
+            total_units=int(default.get("total_units", 1)),
+            occupancy_pct=int(default.get("occupancy_pct", 0)),
+            unit_rev=float(default.get("unit_rev", 0.0)),
+            unit_cost=float(default.get("unit_cost", 0.0)),
+            referrals_per_unit=float(default.get("referrals_per_unit", 0.0)),
+            revenue_per_referral=float(referrals.get("revenue_per_referral", 0.0)),
+            referral_pcts=tuple(int(rt.get("pct", 0)) for rt in referrals.get("types", [])),
+            locum=LocumDefaults.from_config(sl.get("locum", {})),
+        )
+
+
+@st.cache_resource(max_entries=8)
+def service_index(
+    signature: ConfigSignature,
+) -> Tuple[Dict[str, Dict[str, Any]], Tuple[str, ...], Dict[str, ServiceDefaults]]:
+    cfg = load_config(signature)
+    service_map = {sl["display_name"]: sl for sl in cfg.get("service_lines", [])}
+    defaults = {name: ServiceDefaults.from_config(sl) for name, sl in service_map.items()}
+    return service_map, tuple(service_map), defaults
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def ref_unit_rev_array(signature: ConfigSignature, service_name: str, fallback: float) -> np.ndarray:
+    service_map = service_index(signature)[0]
+    types = service_map[service_name].get("referrals", {}).get("types", [])
+    return np.fromiter((float(rt.get("unit_rev", fallback)) for rt in types), dtype=np.float64, count=len(types))
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def normalize_percents(percent_values: Tuple[int, ...], normalize: bool) -> List[int]:
+    # Rescale the referral mix to 100%, putting any rounding drift on the first type
+    pct_sum = sum(percent_values)
+    if not normalize or pct_sum in (0, 100):
+        return list(percent_values)
+    scaled = np.rint(np.asarray(percent_values, dtype=np.float64) * (100.0 / pct_sum)).astype(int)
+    scaled[0] += 100 - scaled.sum()
+    return scaled.tolist()
+
+
+def blended_referral_revenue(percent_values: Sequence[int], unit_revs: np.ndarray) -> float:
+    # Percent-weighted downstream revenue per referral
+    return float(np.dot(np.asarray(percent_values, dtype=np.float64), unit_revs)) / 100.0
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def scenarios(
+    total_units: int,
+    unit_rev: float,
+    unit_cost: float,
+    referrals_per_unit: float,
+    ref_rev_per_referral: float,
+    staffed_pcts: Tuple[int, ...],
+    locum_costs: Tuple[float, ...],
+) -> List[Dict[str, float]]:
+    # One vectorized pass over every staffing scenario; results come back in input order
+    staffed = np.clip(np.asarray(staffed_pcts, dtype=np.int64), 0, 100)
+    # Staffed % comes from integer sliders, so round total_units * pct / 100 in integer math (half to even)
+    units_covered, rem = np.divmod(total_units * staffed, 100)
+    units_covered += (rem > 50) | ((rem == 50) & (units_covered % 2 == 1))
+    gross_rev = units_covered * float(unit_rev)
+    operating_cost = units_covered * float(unit_cost)
+    ref_rev = total_units * referrals_per_unit * (staffed / 100.0) * ref_rev_per_referral
+    locum_cost_per = np.asarray(locum_costs, dtype=np.float64)
+    net_before = gross_rev + ref_rev - operating_cost
+    net_after = net_before - locum_cost_per
+    keys = ("staffed_pct", "units_covered", "gross_rev", "operating_cost",
+            "referral_rev", "locum_total", "net_before", "net_after")
+    columns = (staffed, units_covered, gross_rev, operating_cost, ref_rev, locum_cost_per, net_before, net_after)
+    return [dict(zip(keys, row)) for row in zip(*(c.tolist() for c in columns))]
+
+
+class ScenarioRow(NamedTuple):
+    """One exported scenario, in CSV column order."""
+    service_line: str
+    total_units: int
+    staffed_pct: int
+    units_covered: int
+    unit_rev: float
+    unit_cost: float
+    referrals_per_unit: float
+    referral_revenue: float
+    gross_rev: float
+    operating_cost: float
+    net_before_locum_per_shift: float
+    locum_total_per_shift: float
+    net_after_locum_per_shift: float
+    period_days: int
+    locum_total_period: float
+    net_after_locum_period: float